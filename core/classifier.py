@@ -2,18 +2,285 @@
 This module provides the HeadlineClassifier class for categorizing YouTube video titles (or other text) using a zero-shot classification model.
 Refactored for modularity: the classifier is now encapsulated in a class for easier testing and reuse, and supports custom candidate categories.
 """
-from transformers import pipeline
+import os
+import threading
+from pathlib import Path
+
+import torch
+from transformers import AutoTokenizer, pipeline
+
+ONNX_CACHE_DIR = Path(".onnx_cache")
+
+# distilbart-mnli-12-3 keeps most of bart-large-mnli's zero-shot accuracy at a fraction
+# of the compute; pass "facebook/bart-large-mnli" for maximum accuracy on strong hardware
+DEFAULT_MODEL_NAME = "valhalla/distilbart-mnli-12-3"
+
+# Same hypothesis template as the transformers zero-shot pipeline
+HYPOTHESIS_TEMPLATE = "This example is {}."
+
+# With compile_model=True the model is compiled with dynamic=False, one specialized graph
+# per shape. (text, label) pairs are padded up to the nearest row bucket (larger batches
+# run in chunks of the biggest one) and sequences to a multiple of SEQUENCE_BUCKET.
+# Every ROW_BUCKETS x WARMUP_LENGTHS shape is compiled before the first batch; headline
+# pairs rarely exceed 64 tokens, and longer ones compile their own graph on first use.
+# A full site (10 headlines x 7 labels = 70 pairs) fits the 128 bucket
+ROW_BUCKETS = (8, 16, 32, 64, 128)
+SEQUENCE_BUCKET = 32
+WARMUP_LENGTHS = (32, 64)
+
+def _default_device():
+    """Pipeline device: first CUDA GPU, then Apple MPS, falling back to CPU (-1)."""
+    if torch.cuda.is_available():
+        return 0
+    if torch.backends.mps.is_available():
+        return "mps"
+    return -1
+
+def _default_dtype(device):
+    """float16 on CUDA GPUs with native half-precision support (Volta or newer), else the model default."""
+    if device == 0 and torch.cuda.get_device_capability(0)[0] >= 7:
+        return torch.float16
+    return None
 
 class HeadlineClassifier:
-    def __init__(self, model_name="facebook/bart-large-mnli"):
-        self.model = pipeline("zero-shot-classification", model=model_name)
+    def __init__(self, model_name=DEFAULT_MODEL_NAME, quantize=True, backend="torch", compile_model=False,
+                 num_threads=None):
+        """
+        Loads the zero-shot pipeline on the best available device (CUDA, MPS, then CPU),
+        in float16 on capable GPUs. On CPU the Linear layers are dynamically
+        quantized to INT8, which cuts latency and memory with negligible accuracy loss.
+        With backend="onnx" the model is instead exported to ONNX, quantized to INT8
+        for AVX512-VNNI and served by ONNX Runtime (requires optimum[onnxruntime]).
+        compile_model=True runs the torch model through torch.compile (PyTorch 2.x) with
+        one specialized graph per bucketed shape, falling back to eager execution if compilation or a compiled
+        forward fails.
+        num_threads sets the CPU inference threads for either backend (default: all cores);
+        INT8 kernels scale with it.
+        """
+        if backend not in ("torch", "onnx"):
+            raise ValueError("backend must be 'torch' or 'onnx'")
+        self.model_name = model_name
+        num_threads = num_threads or os.cpu_count() or 1
+
+        if backend == "onnx":
+            self.model = self._load_onnx_pipeline(model_name, num_threads)
+            dtype = "float32"
+            quantized = True
+        else:
+            torch.set_num_threads(num_threads)  # process-wide intra-op pool
+            device = _default_device()
+            self.model = pipeline(
+                "zero-shot-classification",
+                model=model_name,
+                device=device,
+                torch_dtype=_default_dtype(device),
+            )
+            dtype = str(self.model.model.dtype).replace("torch.", "")
+            quantized = quantize and self.model.device.type == "cpu"
+            if quantized:
+                self.model.model = torch.quantization.quantize_dynamic(
+                    self.model.model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+
+        # Identifies everything that changes the scores for a given model name, so cached
+        # predictions from one backend/precision are never reused by another
+        self.cache_key = f"{model_name}|{backend}|{dtype}|{'int8' if quantized else 'fp'}"
+
+        self.entailment_id = self._find_entailment_id(self.model.model.config)
+        self._hypotheses_cache = {}  # labels tuple -> hypothesis sentences
+        self._pad_to_multiple_of = None
+        self._eager_model = None  # set while the compiled model is in use
+        self._warmed_thread = None
+        if compile_model and backend == "torch":
+            self._compile_model()
+
+    @staticmethod
+    def _load_onnx_pipeline(model_name, num_threads):
+        """
+        Builds an ONNX Runtime zero-shot pipeline backed by an INT8-quantized export.
+        The quantized model is cached on disk so only the first run pays for export and quantization.
+        """
+        from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+        from optimum.pipelines import pipeline as ort_pipeline
+        from onnxruntime import SessionOptions
+
+        quantized_dir = ONNX_CACHE_DIR / model_name.replace("/", "__")
+        quantized_file = "model_quantized.onnx"
+        # Written last, so an export interrupted at any step is redone on the next startup
+        complete_marker = quantized_dir / ".complete"
+
+        if not complete_marker.exists():
+            print(f"Exporting {model_name} to ONNX and quantizing to INT8 (first run only)...")
+            quantized_dir.mkdir(parents=True, exist_ok=True)
+            AutoTokenizer.from_pretrained(model_name).save_pretrained(quantized_dir)
+            onnx_model = ORTModelForSequenceClassification.from_pretrained(model_name, export=True)
+            quantizer = ORTQuantizer.from_pretrained(onnx_model)
+            qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+            quantizer.quantize(save_dir=quantized_dir, quantization_config=qconfig)
+            complete_marker.touch()
+
+        session_options = SessionOptions()
+        session_options.intra_op_num_threads = num_threads
+        quantized_model = ORTModelForSequenceClassification.from_pretrained(
+            quantized_dir, file_name=quantized_file, session_options=session_options
+        )
+        tokenizer = AutoTokenizer.from_pretrained(quantized_dir)
+        return ort_pipeline("zero-shot-classification", model=quantized_model, tokenizer=tokenizer, accelerator="ort")
+
+    def _compile_model(self):
+        """
+        Replaces the model with a torch.compile'd version. Compilation itself happens
+        lazily in _warm_up, on the thread that runs inference.
+        """
+        if not hasattr(torch, "compile"):
+            print("torch.compile requires PyTorch 2.x; running the model eagerly")
+            return
+
+        # dynamic=False compiles one graph per bucketed shape; allow all of them (plus a few
+        # longer sequence lengths) before dynamo gives up and runs the model eagerly
+        dynamo_config = torch._dynamo.config
+        limit_name = "recompile_limit" if hasattr(dynamo_config, "recompile_limit") else "cache_size_limit"
+        shape_count = len(ROW_BUCKETS) * (len(WARMUP_LENGTHS) + 2)
+        setattr(dynamo_config, limit_name, max(getattr(dynamo_config, limit_name), shape_count))
+
+        try:
+            compiled_model = torch.compile(self.model.model, mode="reduce-overhead", fullgraph=False, dynamic=False)
+        except Exception as e:
+            print(f"torch.compile failed, running the model eagerly: {e}")
+            return
+        self._eager_model = self.model.model
+        self.model.model = compiled_model
+        self._pad_to_multiple_of = SEQUENCE_BUCKET
+
+    def _fall_back_to_eager(self, error):
+        print(f"torch.compile failed, running the model eagerly: {error}")
+        self.model.model = self._eager_model
+        self._eager_model = None
+        self._pad_to_multiple_of = None
+
+    def _warm_up(self):
+        """
+        Compiles the model for every row bucket and warm-up length before the first batch
+        on a thread; reduce-overhead keeps its CUDA-graph state per thread.
+        Later batches on that thread reuse these graphs instead of recompiling.
+        """
+        tokenizer = self.model.tokenizer
+        for rows in ROW_BUCKETS:
+            for length in WARMUP_LENGTHS:
+                inputs = tokenizer(
+                    ["warm up " * length] * rows,
+                    [HYPOTHESIS_TEMPLATE.format("warm up")] * rows,
+                    truncation="only_first",
+                    max_length=length,
+                    padding="max_length",
+                    return_tensors="pt",
+                ).to(self.model.device)
+                with torch.inference_mode():
+                    self.model.model(**inputs)
+        self._warmed_thread = threading.get_ident()
+
+    @staticmethod
+    def _row_bucket(rows):
+        """Smallest row bucket that holds the given number of pairs."""
+        return next(bucket for bucket in ROW_BUCKETS if bucket >= rows)
+
+    def _entailment_logits(self, inputs):
+        """
+        Runs the model and returns the entailment logit of every (text, label) pair.
+        The compiled model is fed chunks padded up to a row bucket by repeating the first pair.
+        """
+        if self._eager_model is None:
+            with torch.inference_mode():
+                return self.model.model(**inputs).logits[:, self.entailment_id].float()
+
+        if self._warmed_thread != threading.get_ident():
+            self._warm_up()
+        total = inputs["input_ids"].shape[0]
+        max_rows = ROW_BUCKETS[-1]
+        entailment_chunks = []
+        for start in range(0, total, max_rows):
+            chunk = {name: tensor[start:start + max_rows] for name, tensor in inputs.items()}
+            rows = chunk["input_ids"].shape[0]
+            bucket = self._row_bucket(rows)
+            if rows < bucket:
+                chunk = {
+                    name: torch.cat([tensor, tensor[:1].expand(bucket - rows, -1)])
+                    for name, tensor in chunk.items()
+                }
+            with torch.inference_mode():
+                logits = self.model.model(**chunk).logits
+            # clone: CUDA-graph outputs are overwritten by the next replay
+            entailment_chunks.append(logits[:rows, self.entailment_id].float().clone())
+        return torch.cat(entailment_chunks)
+
+    @staticmethod
+    def _find_entailment_id(config):
+        for label, idx in config.label2id.items():
+            if label.lower().startswith("entail"):
+                return idx
+        raise ValueError("model config has no entailment label; it is not an NLI model")
+
+    def _hypotheses(self, candidate_labels):
+        """Returns the hypothesis sentence for each label, built once per label set."""
+        key = tuple(candidate_labels)
+        if key not in self._hypotheses_cache:
+            self._hypotheses_cache[key] = [HYPOTHESIS_TEMPLATE.format(label) for label in candidate_labels]
+        return self._hypotheses_cache[key]
+
+    def _encode_pairs(self, texts, candidate_labels):
+        """
+        Tokenizes every (text, label) pair in one batched call to the fast tokenizer,
+        with the same truncation and padding the transformers zero-shot pipeline uses.
+        """
+        hypotheses = self._hypotheses(candidate_labels)
+        premises = [text for text in texts for _ in hypotheses]
+        return self.model.tokenizer(
+            premises,
+            hypotheses * len(texts),
+            truncation="only_first",
+            padding=True,
+            pad_to_multiple_of=self._pad_to_multiple_of,
+            return_tensors="pt",
+        )
 
     def classify(self, text, candidate_labels):
         """
         Classifies the input text into one of the candidate_labels using zero-shot classification.
         Returns the best category, all scores, and the raw model output.
         """
-        result = self.model(text, candidate_labels)
-        best_idx = result['scores'].index(max(result['scores']))
-        best_category = result['labels'][best_idx]
-        return best_category, result['scores'], result
+        return self.classify_batch([text], candidate_labels)[0]
+
+    def classify_batch(self, texts, candidate_labels):
+        """
+        Classifies a list of texts in a single batched forward pass over all
+        (text, label) pairs, tokenized together in one call.
+        Returns a list of (best_category, scores, raw_result) tuples, one per input text,
+        with scores sorted in descending order.
+        """
+        if not texts:
+            return []
+        inputs = self._encode_pairs(texts, candidate_labels).to(self.model.device)
+        try:
+            entailment_logits = self._entailment_logits(inputs)
+        except Exception as e:
+            if self._eager_model is None:
+                raise
+            # Recompiles for unseen shapes can still fail; retry this batch eagerly
+            self._fall_back_to_eager(e)
+            entailment_logits = self._entailment_logits(inputs)
+
+        # Single-label zero-shot: softmax of the entailment logits across the labels of each text
+        entailment_logits = entailment_logits.reshape(len(texts), len(candidate_labels))
+        probabilities = entailment_logits.softmax(dim=-1).cpu().tolist()
+
+        classified = []
+        for text, label_scores in zip(texts, probabilities):
+            ranked = sorted(zip(candidate_labels, label_scores), key=lambda pair: pair[1], reverse=True)
+            result = {
+                "sequence": text,
+                "labels": [label for label, _ in ranked],
+                "scores": [score for _, score in ranked],
+            }
+            classified.append((result["labels"][0], result["scores"], result))
+        return classified
@@ -2,9 +2,12 @@
 This module provides the Database class for managing SQLite operations for news headlines.
 Enhanced with batch processing and connection pooling for better performance.
 """
+import hashlib
+import itertools
 import sqlite3
+import struct
 from datetime import datetime
-from typing import List, Tuple, Dict, Any
+from typing import List, Tuple, Dict, Any, Iterable
 from threading import Lock
 import queue
 
@@ -26,8 +29,14 @@ class DatabasePool:
         
         # Initialize connections
         for _ in range(pool_size):
-            conn = sqlite3.connect(db_path, check_same_thread=False)
+            # isolation_level=None disables the driver's implicit transactions so that
+            # batch writes can be wrapped in a single explicit BEGIN/COMMIT
+            conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
             conn.execute("PRAGMA journal_mode=WAL")  # Better concurrent access
+            conn.execute("PRAGMA synchronous=NORMAL")  # Safe with WAL, avoids an fsync per commit
+            conn.execute("PRAGMA busy_timeout=5000")  # Wait on locks instead of failing with SQLITE_BUSY
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA cache_size=-20000")  # 20MB page cache
             self.connections.put(conn)
     
     def get_connection(self) -> sqlite3.Connection:
@@ -44,6 +53,50 @@ class DatabasePool:
             conn = self.connections.get()
             conn.close()
 
+INSERT_HEADLINE_SQL = (
+    "INSERT INTO headlines (source, headline, category, raw_label, confidence, scraped_at) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+
+UPSERT_CACHE_SQL = (
+    "INSERT OR REPLACE INTO headline_cache (model, text, labels_hash, category, scores) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+
+def labels_hash(labels: List[str]) -> str:
+    """Order-independent short hash identifying a set of candidate labels."""
+    return hashlib.blake2b("\0".join(sorted(labels)).encode(), digest_size=8).hexdigest()
+
+def _pack_scores(scores: List[float]) -> bytes:
+    return struct.pack("<%df" % len(scores), *scores)
+
+def _unpack_scores(blob: bytes) -> List[float]:
+    return list(struct.unpack("<%df" % (len(blob) // 4), blob))
+
+# Columns staged by save(); scraped_at is added when the batch is flushed
+PENDING_COLUMNS = ("source", "headline", "category", "raw_label", "confidence")
+
+def _new_pending_batch() -> Dict[str, List[Any]]:
+    """Empty column-oriented staging area: one list per column instead of one tuple per row."""
+    return {column: [] for column in PENDING_COLUMNS}
+
+def _batch_timestamp() -> str:
+    """Current time formatted like sqlite3's datetime adapter, so rows stay comparable."""
+    return datetime.now().isoformat(" ")
+
+def _executemany_in_transaction(conn: sqlite3.Connection, sql: str, rows: Iterable[Tuple]) -> None:
+    """Run executemany inside one explicit transaction, rolling back on any failure."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany(sql, rows)
+        conn.execute("COMMIT")
+    except BaseException:
+        # Also covers errors raised by a lazy rows iterator and KeyboardInterrupt, so the
+        # connection never goes back to the pool with an open transaction
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+
 class Database:
     def __init__(self, db_path: str, pool_size: int = 3):
         """
@@ -59,7 +112,7 @@ class Database:
         self.db_path = db_path
         self.pool = DatabasePool(db_path, pool_size)
         self.batch_size = 50  # Number of records to batch together
-        self.pending_batch: List[Tuple] = []
+        self.pending_batch: Dict[str, List[Any]] = _new_pending_batch()
         self.batch_lock = Lock()
 
     def init_db(self) -> None:
@@ -83,7 +136,18 @@ class Database:
                     scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             """)
-            conn.commit()
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_headlines_source ON headlines(source)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_headlines_scraped_at ON headlines(scraped_at)")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS headline_cache (
+                    model TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    labels_hash TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    scores BLOB NOT NULL,
+                    PRIMARY KEY (model, text, labels_hash)
+                ) WITHOUT ROWID
+            """)
         except sqlite3.Error as e:
             print(f"Database initialization failed: {e}")
             raise
@@ -111,11 +175,22 @@ class Database:
             raise ValueError("confidence must be a number between 0 and 1")
         
         with self.batch_lock:
-            self.pending_batch.append((source, headline, category, raw_label, confidence, datetime.now()))
+            # Timestamp is assigned once per batch when it is flushed
+            batch = self.pending_batch
+            batch["source"].append(source)
+            batch["headline"].append(headline)
+            batch["category"].append(category)
+            batch["raw_label"].append(raw_label)
+            batch["confidence"].append(confidence)
             
-            # Flush batch if it's full
-            if len(self.pending_batch) >= self.batch_size:
-                self._flush_batch()
+            # Swap out a full batch while holding the lock...
+            batch_to_save = None
+            if self._pending_count() >= self.batch_size:
+                batch_to_save = self._take_pending_batch()
+        
+        # ...and write it outside the lock so other savers are not blocked on disk I/O
+        if batch_to_save is not None:
+            self._flush_batch(batch_to_save)
 
     def save_batch(self, headlines_batch: List[Tuple[str, str, str, str, float]]) -> None:
         """
@@ -129,17 +204,12 @@ class Database:
             
         conn = self.pool.get_connection()
         try:
-            cursor = conn.cursor()
-            
-            # Prepare data with timestamps
-            data = [(source, headline, category, raw_label, confidence, datetime.now()) 
+            # Prepare data with a single timestamp for the whole batch
+            now = _batch_timestamp()
+            data = [(source, headline, category, raw_label, confidence, now) 
                    for source, headline, category, raw_label, confidence in headlines_batch]
             
-            cursor.executemany(
-                "INSERT INTO headlines (source, headline, category, raw_label, confidence, scraped_at) VALUES (?, ?, ?, ?, ?, ?)",
-                data
-            )
-            conn.commit()
+            _executemany_in_transaction(conn, INSERT_HEADLINE_SQL, data)
             print(f"Saved {len(headlines_batch)} headlines in batch")
             
         except sqlite3.Error as e:
@@ -148,28 +218,86 @@ class Database:
         finally:
             self.pool.return_connection(conn)
 
-    def _flush_batch(self) -> None:
-        """Flush the pending batch to the database."""
-        if not self.pending_batch:
+    def _pending_count(self) -> int:
+        """Number of rows waiting in the pending batch."""
+        return len(self.pending_batch["source"])
+
+    def _take_pending_batch(self) -> Dict[str, List[Any]]:
+        """Detach the pending batch and start a new one. Caller must hold batch_lock."""
+        batch = self.pending_batch
+        self.pending_batch = _new_pending_batch()
+        return batch
+
+    def _flush_batch(self, batch_to_save: Dict[str, List[Any]]) -> None:
+        """Write a detached batch to the database. Does not touch pending_batch unless the write fails."""
+        count = len(batch_to_save["source"])
+        if not count:
             return
-            
-        batch_to_save = self.pending_batch.copy()
-        self.pending_batch.clear()
         
         conn = self.pool.get_connection()
         try:
-            cursor = conn.cursor()
-            cursor.executemany(
-                "INSERT INTO headlines (source, headline, category, raw_label, confidence, scraped_at) VALUES (?, ?, ?, ?, ?, ?)",
-                batch_to_save
-            )
-            conn.commit()
-            print(f"Flushed batch of {len(batch_to_save)} headlines")
+            now = _batch_timestamp()
+            data = zip(*batch_to_save.values(), itertools.repeat(now))
+            _executemany_in_transaction(conn, INSERT_HEADLINE_SQL, data)
+            print(f"Flushed batch of {count} headlines")
             
         except sqlite3.Error as e:
             print(f"Failed to flush batch: {e}")
             # Restore the batch if it failed
-            self.pending_batch.extend(batch_to_save)
+            with self.batch_lock:
+                for column, values in batch_to_save.items():
+                    self.pending_batch[column].extend(values)
+            raise
+        finally:
+            self.pool.return_connection(conn)
+
+    def get_cached_classifications(self, model: str, texts: List[str], labels: List[str]) -> Dict[str, Tuple[str, List[float]]]:
+        """
+        Look up previously stored predictions for the given texts.
+        
+        Args:
+            model: Name of the model that produced the predictions
+            texts: Headlines to look up
+            labels: Candidate labels the predictions were made against
+            
+        Returns:
+            Mapping of text -> (category, scores) for every cache hit
+        """
+        if not texts:
+            return {}
+        
+        conn = self.pool.get_connection()
+        try:
+            placeholders = ", ".join("?" * len(texts))
+            rows = conn.execute(
+                f"SELECT text, category, scores FROM headline_cache "
+                f"WHERE model = ? AND labels_hash = ? AND text IN ({placeholders})",
+                (model, labels_hash(labels), *texts)
+            ).fetchall()
+            return {text: (category, _unpack_scores(scores)) for text, category, scores in rows}
+        finally:
+            self.pool.return_connection(conn)
+
+    def save_cached_classifications(self, model: str, labels: List[str], predictions: List[Tuple[str, str, List[float]]]) -> None:
+        """
+        Store predictions so later runs can skip inference for unchanged headlines.
+        
+        Args:
+            model: Name of the model that produced the predictions
+            labels: Candidate labels the predictions were made against
+            predictions: List of (text, category, scores) tuples
+        """
+        if not predictions:
+            return
+        
+        key = labels_hash(labels)
+        data = [(model, text, key, category, _pack_scores(scores)) for text, category, scores in predictions]
+        
+        conn = self.pool.get_connection()
+        try:
+            _executemany_in_transaction(conn, UPSERT_CACHE_SQL, data)
+        except sqlite3.Error as e:
+            print(f"Failed to save classification cache: {e}")
             raise
         finally:
             self.pool.return_connection(conn)
@@ -185,7 +313,6 @@ class Database:
         try:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM headlines")
-            conn.commit()
             print("All data cleared from database.")
         except sqlite3.Error as e:
             print(f"Failed to clear database: {e}")
@@ -197,8 +324,9 @@ class Database:
         """Close all database connections and flush any pending batch."""
         try:
             # Flush any remaining batch
-            if self.pending_batch:
-                self._flush_batch()
+            with self.batch_lock:
+                batch_to_save = self._take_pending_batch()
+            self._flush_batch(batch_to_save)
             
             # Close all connections in the pool
             self.pool.close_all()
@@ -210,16 +338,14 @@ class Database:
         conn = self.pool.get_connection()
         try:
             cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM headlines")
-            total_records = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT COUNT(DISTINCT source) FROM headlines")
-            total_sources = cursor.fetchone()[0]
+            # Both aggregates in one statement: a single scan of the source index
+            cursor.execute("SELECT COUNT(*), COUNT(DISTINCT source) FROM headlines")
+            total_records, total_sources = cursor.fetchone()
             
             return {
                 "total_records": total_records,
                 "total_sources": total_sources,
-                "pending_batch_size": len(self.pending_batch)
+                "pending_batch_size": self._pending_count()
             }
         finally:
             self.pool.return_connection(conn)
@@ -2,7 +2,22 @@
 This module provides the ScraperEngine class for extracting headlines from websites,
 classifying them using a zero-shot AI model, and saving results to the database.
 """
-from playwright.sync_api import sync_playwright
+import asyncio
+import json
+import queue
+import sqlite3
+import threading
+
+from playwright.async_api import async_playwright
+
+# Resource types never needed to read headline text from the DOM
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font", "stylesheet"}
+MAX_CONCURRENT_SITES = 4  # caps the number of open browser contexts
+SELECTOR_TIMEOUT_MS = 60000
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
 
 class ScraperEngine:
     def __init__(self, classifier, db):
@@ -11,8 +26,11 @@ class ScraperEngine:
         """
         self.classifier = classifier
         self.db = db
+        # (headline, labels) -> (category, scores, raw_result); reset on every run so the
+        # same headline seen on several sites is classified only once
+        self._classification_cache = {}
 
-    def extract_headlines(self, page, site):
+    async def extract_headlines(self, page, site):
         """
         Extracts headlines from a given site using Playwright.
         Returns a list of headline strings.
@@ -20,24 +38,37 @@ class ScraperEngine:
         name = site["name"]
         url = site["url"]
         selector = site.get("selector")
-        page.goto(url, timeout=60000, wait_until="domcontentloaded") # navigation to url and wait to DOM to load
-        page.wait_for_selector(selector or "#video-title", timeout=10000) # find selector "video-title"
+        await page.goto(url, wait_until="commit") # navigate to url
+        # goto returns at commit, so this wait covers the HTML download, parse and JS render;
+        # it keeps the 60s page budget the old domcontentloaded navigation had
+        await page.wait_for_selector(selector or "#video-title", timeout=SELECTOR_TIMEOUT_MS) # find selector "video-title"
 
         selectors = [selector] if selector else ["h1", "h2", "a"]
         headlines = []
         for sel in selectors:
             try:
-                headlines.extend(page.locator(sel).all_text_contents())
+                headlines.extend(await page.locator(sel).all_text_contents())
             except Exception:
                 continue
         print("Extracted headlines:", headlines)
-        return [h.strip() for h in headlines if h.strip()][:10]
+        unique_headlines = dict.fromkeys(h.strip() for h in headlines if h.strip())  # order-preserving dedup
+        return list(unique_headlines)[:10]
 
     def classify_headlines(self, headlines, candidate_labels, confidence_threshold=0.3):
+        """
+        Classifies all headlines of a site in one batched call and filters by confidence.
+        Returns a list of (headline, category, scores, raw_result) tuples.
+        """
+        labels_key = tuple(candidate_labels)
+        misses = [h for h in headlines if (h, labels_key) not in self._classification_cache]
+        if misses:
+            for headline, result in self._classify_uncached(misses, candidate_labels).items():
+                self._classification_cache[(headline, labels_key)] = result
+
         results = []
         for headline in headlines:
-            category, scores, raw_result = self.classifier.classify(headline, candidate_labels)
-            best_score = max(scores)
+            category, scores, raw_result = self._classification_cache[(headline, labels_key)]
+            best_score = scores[0]  # scores are sorted best-first
             
             # Only include if confidence is above threshold
             if best_score >= confidence_threshold:
@@ -46,6 +77,47 @@ class ScraperEngine:
                 print(f"Skipping '{headline}' - confidence too low: {best_score:.2f}")
         return results
 
+    def _classify_uncached(self, headlines, candidate_labels):
+        """
+        Resolves headlines through the on-disk prediction cache, running the model only
+        for unseen ones and storing their predictions for later runs.
+        Returns a dict of headline -> (category, scores, raw_result).
+        """
+        model_key = self.classifier.cache_key
+        sorted_labels = sorted(candidate_labels)  # cached scores are aligned to this order
+        results = {}
+
+        # The on-disk cache is only an optimization: on any database error fall back to
+        # classifying everything rather than losing the site's headlines
+        try:
+            cached = self.db.get_cached_classifications(model_key, headlines, candidate_labels)
+        except sqlite3.Error as e:
+            print(f"Classification cache lookup failed, classifying all headlines: {e}")
+            cached = {}
+        for headline, (category, label_scores) in cached.items():
+            ranked = sorted(zip(sorted_labels, label_scores), key=lambda pair: pair[1], reverse=True)
+            raw_result = {
+                "sequence": headline,
+                "labels": [label for label, _ in ranked],
+                "scores": [score for _, score in ranked],
+            }
+            results[headline] = (category, raw_result["scores"], raw_result)
+
+        to_classify = [h for h in headlines if h not in results]
+        if to_classify:
+            predictions = []
+            classified = self.classifier.classify_batch(to_classify, candidate_labels)
+            for headline, (category, scores, raw_result) in zip(to_classify, classified):
+                results[headline] = (category, scores, raw_result)
+                score_by_label = dict(zip(raw_result["labels"], raw_result["scores"]))
+                predictions.append((headline, category, [score_by_label[label] for label in sorted_labels]))
+            try:
+                self.db.save_cached_classifications(model_key, candidate_labels, predictions)
+            except sqlite3.Error:
+                pass  # already logged by the database; the fresh predictions are still saved
+
+        return results
+
     def save_headlines(self, source, classified_headlines):
         """
         Saves classified headlines to the database using batch processing.
@@ -56,35 +128,106 @@ class ScraperEngine:
         # Prepare batch data
         batch_data = []
         for headline, category, scores, raw_result in classified_headlines:
-            best_score = max(scores)
-            batch_data.append((source, headline, category, str(scores), best_score))
+            best_score = scores[0]  # scores are sorted best-first
+            scores_json = json.dumps([float(score) for score in scores])  # valid JSON, parse with json.loads
+            batch_data.append((source, headline, category, scores_json, best_score))
         
         # Save entire batch at once
         self.db.save_batch(batch_data)
 
-    def process_site(self, page, site, candidate_labels):
+    def _classify_and_save(self, site_name, headlines, candidate_labels):
         """
-        Orchestrates the extraction, classification, and saving for a single site.
+        Classifies and saves one site's headlines, then prints the results.
         """
-        headlines = self.extract_headlines(page, site)
         classified = self.classify_headlines(headlines, candidate_labels)
-        self.save_headlines(site["name"], classified)
+        self.save_headlines(site_name, classified)
         for headline, category, scores, raw_result in classified:
-            best_score = max(scores)
-            print(f"[{site['name']}] {headline} --> [{category}] (conf: {best_score:.2f})")
+            best_score = scores[0]  # scores are sorted best-first
+            print(f"[{site_name}] {headline} --> [{category}] (conf: {best_score:.2f})")
+
+    def _classify_worker(self, work_queue, candidate_labels):
+        """
+        Consumer thread: drains (site_name, headlines) items until the None sentinel arrives.
+        The inference backends release the GIL during the forward pass, so classification
+        of one site overlaps with page loads of the next ones.
+        """
+        while True:
+            item = work_queue.get()
+            if item is None:
+                break
+            site_name, headlines = item
+            try:
+                self._classify_and_save(site_name, headlines, candidate_labels)
+            except Exception as e:
+                print(f"Failed to process {site_name}: {e}")
+
+    async def process_site(self, page, site, work_queue):
+        """
+        Extracts a site's headlines and hands them to the classification worker.
+        """
+        headlines = await self.extract_headlines(page, site)
+        work_queue.put((site["name"], headlines))
+
+    @staticmethod
+    async def _block_heavy_resources(route):
+        if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _new_context(self, browser, javascript=True):
+        """
+        Creates a browser context that skips images, media, fonts and stylesheets.
+        Sites marked "javascript": false in the config are loaded with JavaScript disabled.
+        """
+        context = await browser.new_context(
+            user_agent=USER_AGENT,
+            viewport={"width": 1280, "height": 720},
+            java_script_enabled=javascript,
+        )
+        context.set_default_navigation_timeout(30000)
+        await context.route("**/*", self._block_heavy_resources)
+        return context
+
+    async def _scrape_site(self, browser, site, semaphore, work_queue):
+        """Scrapes one site in its own browser context, bounded by the shared semaphore."""
+        async with semaphore:
+            context = None
+            try:
+                context = await self._new_context(browser, site.get("javascript", True))
+                page = await context.new_page()
+                await self.process_site(page, site, work_queue)
+            except Exception as e:
+                print(f"Failed to process {site['name']}: {e}")
+            finally:
+                if context is not None:
+                    await context.close()
 
-    def scrape_all_sites(self, websites, candidate_labels):
+    async def scrape_all_sites(self, websites, candidate_labels):
         """
-        Main entry point: scrapes all sites in the list, classifies, and saves results.
+        Main entry point: scrapes all sites concurrently, classifies, and saves results.
+        Page loads overlap across sites and with classification, which runs on a single
+        dedicated worker thread because the model is shared.
         """
         if not websites:
             return
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-            for site in websites:
+        self._classification_cache.clear()
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_SITES)
+        work_queue = queue.Queue()
+        worker = threading.Thread(
+            target=self._classify_worker, args=(work_queue, candidate_labels), daemon=True
+        )
+        worker.start()
+        try:
+            async with async_playwright() as p:
+                browser = await p.chromium.launch(headless=True)
                 try:
-                    self.process_site(page, site, candidate_labels)
-                except Exception as e:
-                    print(f"Failed to process {site['name']}: {e}")
-            browser.close()
+                    await asyncio.gather(*(
+                        self._scrape_site(browser, site, semaphore, work_queue)
+                        for site in websites
+                    ))
+                finally:
+                    await browser.close()
+        finally:
+            work_queue.put(None)  # sentinel: no more sites
+            await asyncio.get_running_loop().run_in_executor(None, worker.join)
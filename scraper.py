@@ -5,10 +5,12 @@ This script loads configuration, initializes the database, and runs the scraping
 Refactored for modularity: scraping, classification, and storage are handled by separate components, now encapsulated in ScraperEngine.
 """
 from core.scraper_engine import ScraperEngine
-from core.classifier import HeadlineClassifier
+from core.classifier import HeadlineClassifier, DEFAULT_MODEL_NAME
 from core.database import Database
 from pathlib import Path
+import asyncio
 import json
+import os
 
 def main():
     config_path = Path("config.json")
@@ -44,9 +46,15 @@ def main():
         db.init_db()
         #db.clear_all_data()  # Clear old data
         
-        classifier = HeadlineClassifier()
+        classifier = HeadlineClassifier(
+            model_name=config.get("model_name", DEFAULT_MODEL_NAME),
+            backend=config.get("classifier_backend", "torch"),
+            compile_model=config.get("compile_model", False),
+            # Leave one core for the event loop and the browser driver
+            num_threads=max(1, (os.cpu_count() or 1) - 1),
+        )
         engine = ScraperEngine(classifier, db)
-        engine.scrape_all_sites(websites, categories)
+        asyncio.run(engine.scrape_all_sites(websites, categories))
         
         # Print database statistics
         stats = db.get_stats()
@@ -0,0 +1,77 @@
+"""
+Behavior tests for HeadlineClassifier's batched zero-shot path: classify_batch must agree
+with the stock transformers zero-shot pipeline over the same weights.
+"""
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+tokenizers = pytest.importorskip("tokenizers")
+
+from core.classifier import HeadlineClassifier
+
+NLI_MODEL = "cross-encoder/nli-MiniLM2-L6-H768"
+LABELS = ["Marketing Strategy", "AI/Technology", "Social Media", "Tutorial/How-to"]
+HEADLINES = [
+    "How to grow your Instagram following in 30 days",
+    "ChatGPT just changed SEO forever",
+    "5 marketing strategies every startup should steal",
+]
+
+
+def _save_tiny_nli_model(path):
+    """Randomly initialized BART NLI model with a word-level tokenizer, built offline."""
+    words = " ".join(HEADLINES + LABELS + ["This example is."]).replace("/", " ").replace(".", " ").split()
+    special = ["<s>", "<pad>", "</s>", "<unk>"]
+    vocab = {token: idx for idx, token in enumerate(special + sorted(set(words)))}
+
+    backend = tokenizers.Tokenizer(tokenizers.models.WordLevel(vocab, unk_token="<unk>"))
+    backend.pre_tokenizer = tokenizers.pre_tokenizers.Whitespace()
+    backend.post_processor = tokenizers.processors.TemplateProcessing(
+        single="<s> $A </s>",
+        pair="<s> $A </s> </s> $B </s>",
+        special_tokens=[("<s>", vocab["<s>"]), ("</s>", vocab["</s>"])],
+    )
+    tokenizer = transformers.PreTrainedTokenizerFast(
+        tokenizer_object=backend, bos_token="<s>", eos_token="</s>", pad_token="<pad>", unk_token="<unk>",
+        model_max_length=64,
+    )
+
+    torch.manual_seed(0)
+    config = transformers.BartConfig(
+        vocab_size=len(vocab), d_model=16, encoder_layers=1, decoder_layers=1,
+        encoder_attention_heads=2, decoder_attention_heads=2, encoder_ffn_dim=32, decoder_ffn_dim=32,
+        max_position_embeddings=64, pad_token_id=vocab["<pad>"], bos_token_id=vocab["<s>"],
+        eos_token_id=vocab["</s>"], decoder_start_token_id=vocab["</s>"],
+        id2label={0: "contradiction", 1: "neutral", 2: "entailment"},
+        label2id={"contradiction": 0, "neutral": 1, "entailment": 2},
+    )
+    transformers.BartForSequenceClassification(config).save_pretrained(path)
+    tokenizer.save_pretrained(path)
+    return str(path)
+
+
+def _assert_matches_pipeline(classifier):
+    batched = classifier.classify_batch(HEADLINES, LABELS)
+    # classifier.model is the stock transformers zero-shot pipeline over the same weights
+    expected = [classifier.model(headline, LABELS) for headline in HEADLINES]
+
+    assert len(batched) == len(HEADLINES)
+    for (category, scores, raw_result), reference in zip(batched, expected):
+        assert raw_result["labels"] == reference["labels"]
+        assert category == reference["labels"][0]
+        assert scores == pytest.approx(reference["scores"], abs=1e-4)
+
+
+def test_classify_batch_matches_zero_shot_pipeline(tmp_path):
+    # fp32 weights so both paths run exactly the same model
+    classifier = HeadlineClassifier(model_name=_save_tiny_nli_model(tmp_path), quantize=False)
+    _assert_matches_pipeline(classifier)
+
+
+def test_classify_batch_matches_zero_shot_pipeline_on_nli_checkpoint():
+    try:
+        classifier = HeadlineClassifier(model_name=NLI_MODEL, quantize=False)
+    except OSError as e:
+        pytest.skip(f"{NLI_MODEL} is not available offline: {e}")
+    _assert_matches_pipeline(classifier)